@@ -1,10 +1,11 @@
 """Telegram bot handlers and commands."""
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.ext import AIORateLimiter, Application, CommandHandler, ContextTypes
 from sqlalchemy import and_, func, or_
-from sqlalchemy.orm import joinedload
-from app.database import User, Assignment, TrackedRepository, Submission, ClassroomAssignmentRecord, get_db, init_db
+from sqlalchemy.orm import joinedload, selectinload
+from app.database import User, Assignment, TrackedRepository, Submission, ClassroomAssignmentRecord, SessionLocal, init_db
 from app.github_client import GitHubClient
+from app.github_client_async import AsyncGitHubClient
 from datetime import datetime, timezone
 from app.config import Config
 from dateutil import parser as date_parser
@@ -12,16 +13,70 @@ from io import BytesIO
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from typing import Tuple, List, Dict, Optional
-from collections import Counter
+from collections import Counter, OrderedDict
 import re
 import json
+import asyncio
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from app.scheduler import NotificationScheduler
 
+# Compiled once at import instead of on every command
+_SLUG_SEPARATOR_RE = re.compile(r'[^a-z0-9]+')
+_NOTIFY_PERIOD_RE = re.compile(r"^(\d+)(m|h)$")
+_GITHUB_USERNAME_RE = re.compile(r"^[A-Za-z0-9-]{1,39}$")
+
 class HomeworkTrackerBot:
     """Main bot class."""
+
+    # Most GitHub clients kept open at once; the least recently used is closed
+    MAX_GITHUB_CLIENTS = 128
     
     def __init__(self):
         self.teacher_password = Config.TEACHER_ACCESS_PASSWORD.strip() if Config.TEACHER_ACCESS_PASSWORD else ''
+        # One client per user, so commands reuse keep-alive connections
+        # instead of paying a fresh TLS handshake each time; replaced (and
+        # the old one closed) when the user registers a different token.
+        # Kept in LRU order and capped at MAX_GITHUB_CLIENTS.
+        self._github_clients: 'OrderedDict[int, GitHubClient]' = OrderedDict()
+        # Set by main(); handlers report deadline changes to it
+        self.scheduler: Optional[NotificationScheduler] = None
+
+    def _deadlines_changed(self, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+        """Tell the scheduler that user_id's reminder times moved: deadlines or notify settings changed.
+
+        The re-arm runs as a background task, so the reply is not held up by it.
+        """
+        if self.scheduler:
+            context.application.create_task(self.scheduler.notify_deadlines_changed(user_id))
+
+    def _github_client(self, user_id: int, token: str) -> GitHubClient:
+        """Return the shared GitHub client for a user, creating it on first use."""
+        client = self._github_clients.get(user_id)
+        if client is not None and client.token != token:
+            self._drop_github_client(user_id)
+            client = None
+        if client is None:
+            client = GitHubClient(token=token)
+            self._github_clients[user_id] = client
+            while len(self._github_clients) > self.MAX_GITHUB_CLIENTS:
+                _, evicted = self._github_clients.popitem(last=False)
+                evicted.close()
+        self._github_clients.move_to_end(user_id)
+        return client
+
+    def _drop_github_client(self, user_id: int) -> None:
+        """Close and forget a user's GitHub client, e.g. after a token change."""
+        client = self._github_clients.pop(user_id, None)
+        if client is not None:
+            client.close()
+
+    def close(self):
+        """Release pooled GitHub connections."""
+        for client in self._github_clients.values():
+            client.close()
+        self._github_clients.clear()
     
     def _normalize_assignment_slug(self, assignment: dict) -> str:
         """Return a normalized slug for an assignment."""
@@ -35,7 +90,7 @@ class HomeworkTrackerBot:
         title = assignment.get('title') or assignment.get('name') or ''
         if not isinstance(title, str):
             title = ''
-        normalized = re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
+        normalized = _SLUG_SEPARATOR_RE.sub('-', title.lower()).strip('-')
         return normalized
 
     def _parse_datetime(self, value) -> Optional[datetime]:
@@ -43,10 +98,14 @@ class HomeworkTrackerBot:
         if isinstance(value, datetime):
             dt = value
         elif isinstance(value, str):
+            # GitHub sends strict ISO 8601; only fall back to dateutil for anything else
             try:
-                dt = date_parser.parse(value)
-            except Exception:
-                return None
+                dt = datetime.fromisoformat(value)
+            except ValueError:
+                try:
+                    dt = date_parser.parse(value)
+                except Exception:
+                    return None
         else:
             return None
         if dt.tzinfo:
@@ -161,10 +220,14 @@ class HomeworkTrackerBot:
         classroom_name: Optional[str],
         assignment: Dict,
         accepted: List[Dict]
-    ):
-        """Persist classroom assignment info and link students based on GitHub usernames."""
+    ) -> bool:
+        """Persist classroom assignment info and link students based on GitHub usernames.
+
+        Returns True if reminders may be affected: a new assignment, a moved
+        deadline or a newly linked student.
+        """
         if not assignment or not teacher:
-            return
+            return False
 
         assignment_name = assignment.get('title') or assignment.get('name') or 'Classroom Assignment'
         assignment_desc = assignment.get('description')
@@ -173,9 +236,10 @@ class HomeworkTrackerBot:
         classroom_id_str = str(classroom_id) if classroom_id is not None else None
         assignment_id_str = str(assignment_id) if assignment_id is not None else None
 
+        now = datetime.utcnow()
         deadline_val = self._parse_datetime(assignment.get('deadline'))
         if deadline_val is None:
-            deadline_val = datetime.utcnow()
+            deadline_val = now
 
         repo_url_candidates = [
             assignment.get('student_repository_url'),
@@ -197,7 +261,9 @@ class HomeworkTrackerBot:
             query = query.filter(Assignment.classroom_id == classroom_id_str, Assignment.name == assignment_name)
         existing_assignment = query.first()
 
+        reminders_changed = False
         if not existing_assignment:
+            reminders_changed = True
             existing_assignment = Assignment(
                 name=assignment_name,
                 description=assignment_desc,
@@ -230,6 +296,7 @@ class HomeworkTrackerBot:
                 changed = True
             if deadline_val and existing_assignment.deadline != deadline_val:
                 existing_assignment.deadline = deadline_val
+                reminders_changed = True
                 changed = True
             if changed:
                 db.commit()
@@ -264,9 +331,10 @@ class HomeworkTrackerBot:
                     github_repo_url=repo_url,
                     is_submitted=submitted_flag,
                     submitted_at=submitted_at,
-                    created_at=datetime.utcnow(),
+                    created_at=now,
                 )
                 db.add(submission)
+                reminders_changed = True
             else:
                 changed = False
                 if repo_url and submission.github_repo_url != repo_url:
@@ -279,9 +347,10 @@ class HomeworkTrackerBot:
                     submission.submitted_at = submitted_at
                     changed = True
                 if changed:
-                    submission.updated_at = datetime.utcnow()
+                    submission.updated_at = now
 
         db.commit()
+        return reminders_changed
 
     def _store_classroom_records(
         self,
@@ -331,9 +400,8 @@ class HomeworkTrackerBot:
         db.commit()
 
     def get_db(self):
-        """Get database session."""
-        db_gen = get_db()
-        return next(db_gen)
+        """Get database session; callers close it in their finally block."""
+        return SessionLocal()
 
     def _format_classroom_label(self, raw: Optional[str]) -> str:
         """Format classroom identifiers into a readable label."""
@@ -461,10 +529,9 @@ class HomeworkTrackerBot:
         
         # Validate token by trying to create a GitHub client
         try:
-            test_client = GitHubClient(token=github_token)
-            # Try to get user info to validate token
-            test_user = test_client.github.get_user()
-            github_username = test_user.login
+            with GitHubClient(token=github_token) as test_client:
+                # Try to get user info to validate token
+                github_username = test_client.authenticated_login
         except Exception as e:
             await update.message.reply_text(
                 f"❌ Invalid GitHub token. Please check your token and try again.\n"
@@ -482,6 +549,7 @@ class HomeworkTrackerBot:
                 if github_username:
                     db_user.github_username = github_username
                 db.commit()
+                self._drop_github_client(db_user.id)
                 display_username = github_username or db_user.github_username
                 message_lines = [
                     "✅ GitHub token registered successfully!",
@@ -535,7 +603,7 @@ class HomeworkTrackerBot:
                 return
 
             try:
-                github_client = GitHubClient(token=db_user.github_token)
+                github_client = self._github_client(db_user.id, db_user.github_token)
             except Exception as e:
                 await update.message.reply_text(f"❌ Could not initialise GitHub client: {e}")
                 return
@@ -545,10 +613,29 @@ class HomeworkTrackerBot:
             fetch_error: Optional[str] = None
 
             try:
-                classroom_assignments = github_client.get_classroom_assignments(db_user.github_username)
+                async with AsyncGitHubClient(token=db_user.github_token) as async_client:
+                    classroom_assignments = await async_client.get_classroom_assignments(db_user.github_username)
             except Exception as e:
                 fetch_error = str(e)
             else:
+                # Index the user's stored assignments once instead of querying per item
+                stored_assignments = (
+                    db.query(Assignment)
+                    .options(selectinload(Assignment.submissions))
+                    .filter(Assignment.user_id == db_user.id)
+                    .order_by(Assignment.id)
+                    .all()
+                )
+                by_classroom_assignment_id: Dict[str, Assignment] = {}
+                by_name: Dict[str, Assignment] = {}
+                now = datetime.utcnow()
+                reminders_changed = False
+                synced = False
+                for stored in stored_assignments:
+                    if stored.classroom_assignment_id:
+                        by_classroom_assignment_id.setdefault(stored.classroom_assignment_id, stored)
+                    by_name.setdefault(stored.name, stored)
+
                 for item in classroom_assignments:
                     assignment_name = (item.get('name') or item.get('title') or 'Classroom Assignment').strip()
                     classroom_id = item.get('classroom_id')
@@ -559,16 +646,14 @@ class HomeworkTrackerBot:
                     if assignment_id_str:
                         classroom_meta[assignment_id_str] = item
 
-                    deadline_dt = self._parse_datetime(item.get('deadline')) or datetime.utcnow()
+                    deadline_dt = self._parse_datetime(item.get('deadline')) or now
                     repo_url = (item.get('url') or '').strip()
                     repo_name = github_client.parse_repo_url(repo_url) if repo_url else assignment_name
 
-                    query = db.query(Assignment).filter(Assignment.user_id == db_user.id)
                     if assignment_id_str:
-                        query = query.filter(Assignment.classroom_assignment_id == assignment_id_str)
+                        assignment_db = by_classroom_assignment_id.get(assignment_id_str)
                     else:
-                        query = query.filter(Assignment.name == assignment_name)
-                    assignment_db = query.first()
+                        assignment_db = by_name.get(assignment_name)
 
                     changed = False
                     if not assignment_db:
@@ -584,7 +669,11 @@ class HomeworkTrackerBot:
                         )
                         db.add(assignment_db)
                         db.flush()
+                        if assignment_id_str:
+                            by_classroom_assignment_id[assignment_id_str] = assignment_db
+                        by_name.setdefault(assignment_name, assignment_db)
                         changed = True
+                        reminders_changed = True
                     else:
                         if item.get('description') and assignment_db.description != item.get('description'):
                             assignment_db.description = item.get('description')
@@ -604,29 +693,37 @@ class HomeworkTrackerBot:
                         if deadline_dt and assignment_db.deadline != deadline_dt:
                             assignment_db.deadline = deadline_dt
                             changed = True
+                            reminders_changed = True
 
                     submission = next((s for s in assignment_db.submissions or [] if s.user_id == db_user.id), None)
                     if not submission:
+                        # Appended through the relationship so a repeat of the
+                        # same assignment later in the loop finds it
                         submission = Submission(
-                            assignment_id=assignment_db.id,
                             user_id=db_user.id,
                             github_repo_url=repo_url or assignment_db.github_repo_url,
                         )
-                        db.add(submission)
+                        assignment_db.submissions.append(submission)
                         changed = True
+                        reminders_changed = True
                     else:
                         if repo_url and submission.github_repo_url != repo_url:
                             submission.github_repo_url = repo_url
-                            submission.updated_at = datetime.utcnow()
+                            submission.updated_at = now
                             changed = True
 
-                    if changed:
-                        db.commit()
-                        db.refresh(assignment_db)
+                    synced = synced or changed
+
+                # One commit for the whole sync: committing per item would
+                # expire the preloaded assignments and reload each one
+                if synced:
+                    db.commit()
+                if reminders_changed:
+                    self._deadlines_changed(context, db_user.id)
 
             assignments = (
                 db.query(Assignment)
-                .options(joinedload(Assignment.user), joinedload(Assignment.submissions))
+                .options(joinedload(Assignment.user), selectinload(Assignment.submissions))
                 .filter(Assignment.user_id == db_user.id)
                 .order_by(Assignment.deadline, Assignment.name)
                 .all()
@@ -836,7 +933,7 @@ class HomeworkTrackerBot:
             
             # Parse repository name from link
             try:
-                github_client = GitHubClient(token=db_user.github_token)
+                github_client = self._github_client(db_user.id, db_user.github_token)
                 repo_name = github_client.parse_repo_url(repo_link)
                 
                 if not repo_name:
@@ -874,6 +971,7 @@ class HomeworkTrackerBot:
             )
             db.add(assignment)
             db.commit()
+            self._deadlines_changed(context, db_user.id)
             
             await update.message.reply_text(
                 f"✅ Assignment '{name}' added successfully!\n\n"
@@ -909,7 +1007,7 @@ class HomeworkTrackerBot:
 
             raw_repo = ' '.join(context.args).strip('"\'')
             try:
-                github_client = GitHubClient(token=db_user.github_token)
+                github_client = self._github_client(db_user.id, db_user.github_token)
                 repo_full_name = github_client.parse_repo_url(raw_repo)
                 if not repo_full_name:
                     await update.message.reply_text(
@@ -970,7 +1068,7 @@ class HomeworkTrackerBot:
                 return
 
             raw_repo = ' '.join(context.args).strip('"\'')
-            github_client = GitHubClient(token=db_user.github_token) if db_user.github_token else None
+            github_client = self._github_client(db_user.id, db_user.github_token) if db_user.github_token else None
             repo_full_name = None
             if github_client:
                 repo_full_name = github_client.parse_repo_url(raw_repo)
@@ -1020,7 +1118,7 @@ class HomeworkTrackerBot:
                 )
                 return
 
-            github_client = GitHubClient(token=db_user.github_token)
+            github_client = self._github_client(db_user.id, db_user.github_token)
 
             repo_filter = None
             if context.args:
@@ -1048,14 +1146,25 @@ class HomeworkTrackerBot:
                 )
                 return
 
+            # The GitHub client is blocking: poll repositories from worker threads
+            # concurrently, capped to stay clear of GitHub's secondary rate limits.
+            semaphore = asyncio.Semaphore(10)
+
+            async def fetch_status(repo_full_name: str):
+                async with semaphore:
+                    return await asyncio.to_thread(github_client.get_ci_status, repo_full_name)
+
+            statuses = await asyncio.gather(
+                *(fetch_status(repo.repo_full_name) for repo in tracked_repos),
+                return_exceptions=True,
+            )
+
             responses = []
-            for repo in tracked_repos:
-                try:
-                    status = github_client.get_ci_status(repo.repo_full_name)
-                except Exception as e:
+            for repo, status in zip(tracked_repos, statuses):
+                if isinstance(status, Exception):
                     responses.append(
                         f"• {repo.repo_full_name}\n"
-                        f"Не удалось получить статус CI: {str(e)}"
+                        f"Не удалось получить статус CI: {str(status)}"
                     )
                     continue
 
@@ -1099,7 +1208,7 @@ class HomeworkTrackerBot:
                 )
                 return
 
-            github_client = GitHubClient(token=db_user.github_token)
+            github_client = self._github_client(db_user.id, db_user.github_token)
 
             classroom_filter = None
             if context.args:
@@ -1113,6 +1222,7 @@ class HomeworkTrackerBot:
 
             matched_sections = []
             records_payload: List[Dict] = []
+            reminders_changed = False
 
             for classroom in classrooms:
                 class_name = classroom.get('name') or f"Classroom #{classroom.get('id')}"
@@ -1155,7 +1265,8 @@ class HomeworkTrackerBot:
                         continue
 
                     try:
-                        self._sync_assignment_record(db, db_user, classroom_id, class_name, assignment, accepted)
+                        if self._sync_assignment_record(db, db_user, classroom_id, class_name, assignment, accepted):
+                            reminders_changed = True
                     except Exception as sync_err:
                         print(f"Sync error for assignment {assignment.get('id')}: {sync_err}")
 
@@ -1209,6 +1320,9 @@ class HomeworkTrackerBot:
             except Exception as store_err:
                 print(f"Failed to store classroom snapshot: {store_err}")
 
+            if reminders_changed:
+                self._deadlines_changed(context, db_user.id)
+
             if not matched_sections:
                 await update.message.reply_text(
                     "Классы не найдены. Уточните название: /classroom_assignments <часть названия>"
@@ -1270,7 +1384,7 @@ class HomeworkTrackerBot:
                 )
                 return
 
-            github_client = GitHubClient(token=db_user.github_token)
+            github_client = self._github_client(db_user.id, db_user.github_token)
 
             classroom_filter = None
             if context.args:
@@ -1284,6 +1398,7 @@ class HomeworkTrackerBot:
 
             detail_rows = []
             summary_rows = []
+            reminders_changed = False
 
             for classroom in classrooms:
                 class_name = classroom.get('name') or f"Classroom #{classroom.get('id')}"
@@ -1350,7 +1465,8 @@ class HomeworkTrackerBot:
                         continue
 
                     try:
-                        self._sync_assignment_record(db, db_user, classroom_id, class_name, assignment, accepted)
+                        if self._sync_assignment_record(db, db_user, classroom_id, class_name, assignment, accepted):
+                            reminders_changed = True
                     except Exception as sync_err:
                         print(f"Sync error during export for assignment {assignment.get('id')}: {sync_err}")
 
@@ -1410,6 +1526,9 @@ class HomeworkTrackerBot:
                         'error': '',
                     })
 
+            if reminders_changed:
+                self._deadlines_changed(context, db_user.id)
+
             if not detail_rows and not summary_rows:
                 await update.message.reply_text(
                     "Нет данных для экспорта. Убедитесь, что вы указали верный фильтр или что в классах есть задания."
@@ -1497,9 +1616,9 @@ class HomeworkTrackerBot:
             users = (
                 db.query(User)
                 .options(
-                    joinedload(User.assignments),
-                    joinedload(User.submissions),
-                    joinedload(User.ci_repositories)
+                    selectinload(User.assignments),
+                    selectinload(User.submissions),
+                    selectinload(User.ci_repositories)
                 )
                 .order_by(User.created_at)
                 .all()
@@ -1770,6 +1889,7 @@ class HomeworkTrackerBot:
             # Delete the assignment (cascade will handle related submissions)
             db.delete(assignment)
             db.commit()
+            self._deadlines_changed(context, db_user.id)
             
             await update.message.reply_text(
                 f"✅ Assignment '{deleted_name}' deleted successfully!"
@@ -1801,6 +1921,7 @@ class HomeworkTrackerBot:
                 return
             db_user.notify_threshold_hours = days * 24
             db.commit()
+            self._deadlines_changed(context, db_user.id)
             await update.message.reply_text(
                 f"✅ Your notification threshold set to {days} day(s) before deadline."
             )
@@ -1819,8 +1940,7 @@ class HomeworkTrackerBot:
                 )
                 return
             token = context.args[0].strip().lower()
-            import re
-            m = re.match(r"^(\d+)(m|h)$", token)
+            m = _NOTIFY_PERIOD_RE.match(token)
             if not m:
                 await update.message.reply_text(
                     "Invalid format. Use <value><m|h>, e.g. 30m or 2h."
@@ -1835,6 +1955,8 @@ class HomeworkTrackerBot:
                 return
             db_user.notify_period_seconds = seconds
             db.commit()
+            NotificationScheduler.invalidate_interval_cache()
+            self._deadlines_changed(context, db_user.id)
             await update.message.reply_text(
                 f"✅ Your notification period set to {value}{unit}."
             )
@@ -1991,7 +2113,7 @@ class HomeworkTrackerBot:
                 return
 
             github_username = context.args[0].strip()
-            if not re.match(r"^[A-Za-z0-9-]{1,39}$", github_username):
+            if not _GITHUB_USERNAME_RE.match(github_username):
                 await update.message.reply_text(
                     "Invalid GitHub username. It should be 1-39 characters, containing letters, numbers, or hyphens."
                 )
@@ -2010,6 +2132,23 @@ class HomeworkTrackerBot:
         finally:
             db.close()
 
+def _configure_logging() -> QueueListener:
+    """Route log records through a queue so emitting never blocks the event loop.
+
+    Returns the started listener; stop it on shutdown to flush pending records.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = QueueListener(log_queue, stream_handler)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+    # httpx logs every Bot API request at INFO, including each long poll
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    listener.start()
+    return listener
+
 def main():
     """Main function to run the bot."""
     # Validate configuration
@@ -2019,11 +2158,22 @@ def main():
         print(f"Configuration error: {e}")
         return
     
+    log_listener = _configure_logging()
+
     # Initialize database
     init_db()
     
     # Create bot application
-    application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        # Pace all Bot API calls under Telegram's flood limits and retry on RetryAfter,
+        # with enough pooled connections for a burst of concurrent reminders
+        .rate_limiter(AIORateLimiter(max_retries=3))
+        .connection_pool_size(64)
+        .pool_timeout(30)
+        .build()
+    )
     
     # Create bot instance
     bot_instance = HomeworkTrackerBot()
@@ -2051,12 +2201,15 @@ def main():
     
     # Start the bot with scheduler
     scheduler = NotificationScheduler(application)
+    bot_instance.scheduler = scheduler
     scheduler.start()
     print("Bot is starting...")
     try:
         application.run_polling(allowed_updates=Update.ALL_TYPES)
     finally:
         scheduler.stop()
+        bot_instance.close()
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
@@ -13,6 +13,8 @@ class Config:
     
     # GitHub
     GITHUB_TOKEN = os.getenv('GITHUB_TOKEN', '')
+    # Directory for an on-disk GitHub HTTP cache; empty keeps a bounded in-memory one
+    GITHUB_HTTP_CACHE_DIR = os.getenv('GITHUB_HTTP_CACHE_DIR', '')
     
     # Database
     # Support Docker PostgreSQL connection
@@ -21,6 +23,9 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'omega_classroom')
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
+    # Connection pool (server databases only): handlers plus scheduler jobs
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
     
     @classmethod
     def get_database_url(cls):
@@ -1,8 +1,10 @@
 """Database models and connection handling."""
+import time
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Text, UniqueConstraint
+from typing import NamedTuple, Optional, Tuple
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Text, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
 from sqlalchemy import text
 from app.config import Config
 
@@ -32,6 +34,15 @@ class User(Base):
     classroom_records = relationship('ClassroomAssignmentRecord', back_populates='teacher', cascade='all, delete-orphan')
     ci_repositories = relationship('TrackedRepository', back_populates='user', cascade='all, delete-orphan')
 
+# Partial index: MIN(notify_period_seconds) for the scheduler interval is a
+# single probe, and users without an override don't take up entries
+Index(
+    'ix_users_notify_period',
+    User.notify_period_seconds,
+    postgresql_where=User.notify_period_seconds > 0,
+    sqlite_where=User.notify_period_seconds > 0,
+)
+
 class Assignment(Base):
     """Assignment model."""
     __tablename__ = 'assignments'
@@ -41,7 +52,7 @@ class Assignment(Base):
     description = Column(Text)
     github_repo_name = Column(String(255), nullable=False)
     github_repo_url = Column(String(500))
-    deadline = Column(DateTime, nullable=False)
+    deadline = Column(DateTime, nullable=False, index=True)
     classroom_id = Column(String(255))
     classroom_assignment_id = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -58,7 +69,7 @@ class Submission(Base):
     __tablename__ = 'submissions'
     
     id = Column(Integer, primary_key=True)
-    assignment_id = Column(Integer, ForeignKey('assignments.id'), nullable=False)
+    assignment_id = Column(Integer, ForeignKey('assignments.id'), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     github_repo_url = Column(String(500))
     last_commit_sha = Column(String(255))
@@ -97,6 +108,15 @@ class Notification(Base):
     sent_at = Column(DateTime, default=datetime.utcnow)
     is_read = Column(Boolean, default=False)
 
+# Covers the last-sent lookup per (user, assignment, type) as an index-only scan
+Index(
+    'ix_notif_lookup',
+    Notification.user_id,
+    Notification.assignment_id,
+    Notification.notification_type,
+    Notification.sent_at.desc(),
+)
+
 class ClassroomAssignmentRecord(Base):
     """Snapshot records of classroom assignments fetched for teachers."""
     __tablename__ = 'classroom_assignment_records'
@@ -122,7 +142,19 @@ class ClassroomAssignmentRecord(Base):
     teacher = relationship('User', back_populates='classroom_records')
 
 # Database setup
-engine = create_engine(Config.get_database_url(), echo=False)
+def _engine_options(url: str) -> dict:
+    """Pool settings for the engine; SQLite keeps SQLAlchemy's default pool."""
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        # Drop connections the server closed while idle between scheduler runs
+        'pool_pre_ping': True,
+    }
+
+_database_url = Config.get_database_url()
+engine = create_engine(_database_url, echo=False, **_engine_options(_database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
@@ -133,12 +165,13 @@ def init_db():
         _migrate_user_role_column()
         _migrate_assignment_classroom_columns()
         _migrate_assignment_note_column()
+        _migrate_indexes()
     except Exception as e:
         # Non-fatal: log and continue
         print(f"Migration check failed: {e}")
 
 def get_db():
-    """Get database session."""
+    """Get database session (generator form; prefer ``with SessionLocal() as db``)."""
     db = SessionLocal()
     try:
         yield db
@@ -155,14 +188,38 @@ class AppSettings(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 def get_or_create_settings(db: 'Session') -> 'AppSettings':
+    """Return the settings row, creating it in the caller's transaction if missing."""
     settings = db.query(AppSettings).get(1)
     if not settings:
         settings = AppSettings(id=1)
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        db.flush()
     return settings
 
+class SettingsSnapshot(NamedTuple):
+    """Detached copy of the notification defaults held in AppSettings."""
+    notify_threshold_hours: int
+    notify_period_seconds: int
+
+# Settings change rarely but are read on every scheduler tick
+SETTINGS_CACHE_TTL = 60
+_settings_cache: Optional[Tuple[float, SettingsSnapshot]] = None
+
+def get_cached_settings(db: 'Session') -> SettingsSnapshot:
+    """Return notification defaults, re-reading AppSettings at most every SETTINGS_CACHE_TTL seconds."""
+    global _settings_cache
+    if _settings_cache and time.monotonic() - _settings_cache[0] < SETTINGS_CACHE_TTL:
+        return _settings_cache[1]
+    settings = get_or_create_settings(db)
+    snapshot = SettingsSnapshot(settings.notify_threshold_hours, settings.notify_period_seconds)
+    _settings_cache = (time.monotonic(), snapshot)
+    return snapshot
+
+def invalidate_settings_cache():
+    """Drop the cached settings; call after changing AppSettings."""
+    global _settings_cache
+    _settings_cache = None
+
 def _migrate_user_notification_columns():
     """Ensure new user notification columns exist (best-effort, idempotent)."""
     dialect = engine.dialect.name
@@ -239,3 +296,22 @@ def _migrate_assignment_note_column():
                 conn.execute(text("ALTER TABLE assignments ADD COLUMN note TEXT"))
             except Exception:
                 pass
+
+# Indexes added after the first release; create_all only builds them for new tables
+_INDEX_MIGRATIONS = [
+    "CREATE INDEX IF NOT EXISTS ix_notif_lookup "
+    "ON notifications (user_id, assignment_id, notification_type, sent_at DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_assignments_deadline ON assignments (deadline)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_assignment_id ON submissions (assignment_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_notify_period "
+    "ON users (notify_period_seconds) WHERE notify_period_seconds > 0",
+]
+
+def _migrate_indexes():
+    """Ensure indexes added after the first release exist."""
+    for ddl in _INDEX_MIGRATIONS:
+        with engine.begin() as conn:
+            try:
+                conn.execute(text(ddl))
+            except Exception:
+                pass
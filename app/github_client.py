@@ -1,10 +1,193 @@
 """GitHub Classroom API integration."""
-from github import Github
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from functools import cached_property
+from typing import List, Dict, Optional, Any, Tuple
 from app.config import Config
 import requests
+from cachecontrol import CacheControlAdapter
+from cachecontrol.cache import DictCache
+from cachecontrol.caches import FileCache
 import json
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    """Parse a GitHub ISO-8601 timestamp; Python 3.11+ accepts the trailing 'Z' natively.
+
+    A malformed value is logged and read as None, so one bad row doesn't
+    sink the whole listing it belongs to.
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        logger.warning("Ignoring malformed timestamp %r", value)
+        return None
+
+# Classrooms and their assignments change on the order of days, so listings
+# are cached per token for CLASSROOM_CACHE_TTL seconds, shared by the sync and
+# async clients. Expired entries are pruned on insert and the cache is kept in
+# LRU order, capped at CLASSROOM_CACHE_MAXSIZE listings.
+CLASSROOM_CACHE_TTL = 600
+CLASSROOM_CACHE_MAXSIZE = 256
+_listing_cache: 'OrderedDict[Tuple, Tuple[float, List[Dict]]]' = OrderedDict()
+
+def get_cached_listing(key: Tuple) -> Optional[List[Dict]]:
+    """Return a copy of a fresh cached listing, or None."""
+    cached = _listing_cache.get(key)
+    if not cached or time.monotonic() - cached[0] >= CLASSROOM_CACHE_TTL:
+        return None
+    _listing_cache.move_to_end(key)
+    return [dict(item) for item in cached[1]]
+
+def cache_listing(key: Tuple, items: List[Dict]) -> None:
+    """Cache a listing; errors surface as empty lists, so those are not stored."""
+    if not items:
+        return
+    now = time.monotonic()
+    for stale in [k for k, (stored_at, _) in _listing_cache.items() if now - stored_at >= CLASSROOM_CACHE_TTL]:
+        del _listing_cache[stale]
+    _listing_cache[key] = (now, [dict(item) for item in items])
+    _listing_cache.move_to_end(key)
+    while len(_listing_cache) > CLASSROOM_CACHE_MAXSIZE:
+        _listing_cache.popitem(last=False)
+
+class _LRUDictCache(DictCache):
+    """In-memory CacheControl store that keeps only the most recently used responses."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.data: 'OrderedDict[str, bytes]' = OrderedDict()
+        self.maxsize = maxsize
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, expires: Any = None) -> None:
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+# Default HTTP cache: per process, so cached (often private) response bodies
+# never outlive the bot, and capped at HTTP_CACHE_MAXSIZE responses.
+HTTP_CACHE_MAXSIZE = 512
+_http_cache = _LRUDictCache(HTTP_CACHE_MAXSIZE)
+
+def _format_commit(commit: Dict) -> Dict:
+    """Reduce a raw /commits item to the fields the bot uses."""
+    author = (commit.get('commit') or {}).get('author') or {}
+    return {
+        'sha': commit.get('sha'),
+        'message': (commit.get('commit') or {}).get('message'),
+        'author': author.get('name') or 'Unknown',
+        'date': _parse_iso(author.get('date')),
+        'url': commit.get('html_url'),
+    }
+
+def normalize_classroom(classroom: Dict) -> Dict:
+    """Reduce a raw /classrooms item to the fields the bot uses."""
+    return {
+        'id': classroom.get('id'),
+        'name': classroom.get('name'),
+        'url': classroom.get('url'),
+        'archived': classroom.get('archived', False),
+        'organization': classroom.get('organization', {}),
+    }
+
+
+def normalize_assignment(assignment: Dict) -> Dict:
+    """Reduce a raw classroom assignment item to the fields the bot uses."""
+    # Parse deadline if it exists
+    deadline = _parse_iso(assignment.get('deadline'))
+
+    return {
+        'id': assignment.get('id'),
+        'title': assignment.get('title'),
+        'slug': assignment.get('slug'),
+        'description': assignment.get('description'),
+        'deadline': deadline,
+        'student_repository_url': assignment.get('student_repository_url'),
+        'state': assignment.get('state'),
+        'type': assignment.get('type'),
+        'invitations_url': assignment.get('invitations_url'),
+        'accepted': assignment.get('accepted', 0),
+        'submitted': assignment.get('submitted', 0),
+        'passing': assignment.get('passing', 0),
+        'language': assignment.get('language'),
+        'starter_code_repository': assignment.get('starter_code_repository', {}),
+        'classroom': assignment.get('classroom', {}),
+        'accepted_assignments_url': assignment.get('accepted_assignments_url'),
+    }
+
+
+def flatten_classroom_assignment(
+    classroom: Dict,
+    a: Dict,
+    grades: List[Dict],
+    github_username: Optional[str] = None,
+) -> Dict:
+    """Build the flat bot-facing record for one assignment (see AsyncGitHubClient.get_classroom_assignments)."""
+    repo_url = ''
+    participant = False
+    matched_username = ''
+    if github_username:
+        for g in grades:
+            # Try multiple shapes to extract username
+            u = None
+            if isinstance(g.get('student'), dict):
+                u = g['student'].get('github_username') or g['student'].get('login')
+            if not u:
+                u = g.get('github_username') or g.get('login')
+            if u and u.lower() == github_username.lower():
+                repo_url = (
+                    g.get('student_repository_url')
+                    or (isinstance(g.get('repository'), dict) and (g['repository'].get('html_url') or g['repository'].get('url')))
+                    or ''
+                )
+                matched_username = u
+                participant = bool(repo_url)
+                break
+    # Fallbacks if grades did not yield a repo URL
+    if not repo_url:
+        sr = a.get('student_repository_url')
+        if isinstance(sr, str):
+            repo_url = sr
+            if github_username and github_username.lower() in sr.lower():
+                participant = True
+                matched_username = github_username
+    if not repo_url:
+        repo_obj = a.get('starter_code_repository') or {}
+        if isinstance(repo_obj, dict):
+            repo_url = repo_obj.get('html_url') or repo_obj.get('url') or ''
+    if not repo_url:
+        repo_url = a.get('invitations_url') or ''
+    if not participant and repo_url and github_username:
+        if github_username.lower() in repo_url.lower():
+            participant = True
+            matched_username = github_username
+
+    return {
+        'name': a.get('title'),
+        'url': repo_url,
+        'description': a.get('description') or '',
+        'deadline': a.get('deadline'),
+        'assignment_id': a.get('id'),
+        'classroom_id': classroom.get('id'),
+        'classroom_name': classroom.get('name'),
+        'participant': participant,
+        'matched_username': matched_username,
+    }
+
 
 class GitHubClient:
     """Client for interacting with GitHub API."""
@@ -21,40 +204,82 @@ class GitHubClient:
         if not self.token:
             raise ValueError("GitHub token is required")
 
-        self.github = Github(self.token)
         self.base_url = "https://api.github.com"
         self.headers = {
             "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json",
             "User-Agent": "Classroom-Guardian-Bot"
         }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # RFC 7234 caching (ETag / Last-Modified revalidation, max-age). GitHub
+        # sends "Vary: Authorization", so entries are never shared across tokens.
+        # The on-disk cache is opt-in: it is never evicted (see README).
+        if Config.GITHUB_HTTP_CACHE_DIR:
+            cache = FileCache(Config.GITHUB_HTTP_CACHE_DIR)
+        else:
+            cache = _http_cache
+        self.session.mount('https://', CacheControlAdapter(cache=cache))
+
+    def __enter__(self) -> 'GitHubClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying HTTP session and its pooled connections."""
+        self.session.close()
+
+    @cached_property
+    def authenticated_login(self) -> Optional[str]:
+        """Login of the token owner, fetched once per client. Raises on a rejected token."""
+        resp = self.session.get(f"{self.base_url}/user")
+        resp.raise_for_status()
+        return resp.json().get('login')
+
+    def _resolve_repo_name(self, repo_name: str) -> str:
+        """Qualify a bare repository name with the authenticated user's login."""
+        if '/' in repo_name:
+            return repo_name
+        return f"{self.authenticated_login}/{repo_name}"
+
+    def _get_paginated(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        missing_as_none: bool = False,
+    ) -> Optional[List[Any]]:
+        """
+        Generic helper to fetch all pages for a GitHub REST endpoint.
 
-    def _get_paginated(self, url: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
-        """Generic helper to fetch all pages for a GitHub REST endpoint."""
+        With missing_as_none=True the result distinguishes an unreachable or 404
+        endpoint (None) from one that answered with an error or non-list body ([]),
+        so callers can fall back to another URL.
+        """
         items: List[Any] = []
-        page = 1
-        while True:
-            q = {"per_page": 100, "page": page}
-            if params:
-                q.update(params)
+        next_url: Optional[str] = url
+        next_params: Optional[Dict[str, Any]] = {"per_page": 100, **(params or {})}
+        while next_url:
             try:
-                resp = requests.get(url, headers=self.headers, params=q)
+                resp = self.session.get(next_url, params=next_params)
+                if resp.status_code == 404 and missing_as_none:
+                    return None
                 if resp.status_code != 200:
-                    print(f"Error GET {url}: {resp.status_code} - {resp.text}")
-                    break
+                    logger.warning("Error GET %s: %s - %s", next_url, resp.status_code, resp.text)
+                    return [] if missing_as_none else items
                 batch = resp.json()
                 if not isinstance(batch, list):
                     # Some endpoints might return a dict; normalize to list where possible
-                    break
-                if not batch:
-                    break
+                    return [] if missing_as_none else items
                 items.extend(batch)
-                if len(batch) < 100:
-                    break
-                page += 1
-            except Exception as e:
-                print(f"Exception GET {url}: {e}")
-                break
+                # GitHub advertises further pages via the Link header; the next URL
+                # already carries the query string, so params are only sent once.
+                next_url = resp.links.get('next', {}).get('url')
+                next_params = None
+            except requests.RequestException:
+                logger.exception("GET %s failed", next_url)
+                return None if missing_as_none else items
         return items
 
     def get_all_classrooms(self) -> List[Dict]:
@@ -64,22 +289,21 @@ class GitHubClient:
         Returns:
             List of classroom dictionaries
         """
+        key = ('classrooms', self.token)
+        cached = get_cached_listing(key)
+        if cached is not None:
+            return cached
+
         classrooms = []
 
         try:
             url = f"{self.base_url}/classrooms"
             classrooms_data = self._get_paginated(url)
-            for classroom in classrooms_data:
-                classrooms.append({
-                    'id': classroom.get('id'),
-                    'name': classroom.get('name'),
-                    'url': classroom.get('url'),
-                    'archived': classroom.get('archived', False),
-                    'organization': classroom.get('organization', {}),
-                })
-        except Exception as e:
-            print(f"Exception getting classrooms: {e}")
+            classrooms = [normalize_classroom(classroom) for classroom in classrooms_data]
+        except Exception:
+            logger.exception("Exception getting classrooms")
 
+        cache_listing(key, classrooms)
         return classrooms
 
     def get_assignments_for_classroom(self, classroom_id: int) -> List[Dict]:
@@ -92,155 +316,23 @@ class GitHubClient:
         Returns:
             List of assignment dictionaries
         """
+        key = ('assignments', self.token, classroom_id)
+        cached = get_cached_listing(key)
+        if cached is not None:
+            return cached
+
         assignments = []
 
         try:
             url = f"{self.base_url}/classrooms/{classroom_id}/assignments"
             assignments_data = self._get_paginated(url)
-            for assignment in assignments_data:
-                # Parse deadline if it exists
-                deadline = assignment.get('deadline')
-                if deadline:
-                    try:
-                        deadline = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
-                    except Exception:
-                        pass
-
-                assignments.append({
-                    'id': assignment.get('id'),
-                    'title': assignment.get('title'),
-                    'slug': assignment.get('slug'),
-                    'description': assignment.get('description'),
-                    'deadline': deadline,
-                    'student_repository_url': assignment.get('student_repository_url'),
-                    'state': assignment.get('state'),
-                    'type': assignment.get('type'),
-                    'invitations_url': assignment.get('invitations_url'),
-                    'accepted': assignment.get('accepted', 0),
-                    'submitted': assignment.get('submitted', 0),
-                    'passing': assignment.get('passing', 0),
-                    'language': assignment.get('language'),
-                    'starter_code_repository': assignment.get('starter_code_repository', {}),
-                    'classroom': assignment.get('classroom', {}),
-                    'accepted_assignments_url': assignment.get('accepted_assignments_url'),
-                })
-        except Exception as e:
-            print(f"Exception getting assignments for classroom {classroom_id}: {e}")
+            assignments = [normalize_assignment(assignment) for assignment in assignments_data]
+        except Exception:
+            logger.exception("Exception getting assignments for classroom %s", classroom_id)
 
+        cache_listing(key, assignments)
         return assignments
 
-    def get_all_classrooms_with_assignments(self) -> List[Dict]:
-        """
-        Get all classrooms with their assignments.
-
-        Returns:
-            List of classroom dictionaries with nested assignments
-        """
-        result = []
-
-        # Get all classrooms
-        classrooms = self.get_all_classrooms()
-        print(f"Found {len(classrooms)} classrooms")
-
-        for classroom in classrooms:
-            classroom_id = classroom['id']
-            print(f"Processing classroom: {classroom['name']} (ID: {classroom_id})")
-
-            # Get assignments for this classroom
-            assignments = self.get_assignments_for_classroom(classroom_id)
-            classroom['assignments'] = assignments
-            classroom['assignments_count'] = len(assignments)
-
-            result.append(classroom)
-
-            print(f"  Found {len(assignments)} assignments in classroom '{classroom['name']}'")
-
-        return result
-
-    def _get_assignment_grades(self, assignment_id: int) -> List[Dict]:
-        """Fetch grades (or per-student records) for a specific assignment."""
-        try:
-            url = f"{self.base_url}/assignments/{assignment_id}/grades"
-            # Grades may be a list; use pagination helper for safety
-            return self._get_paginated(url)
-        except Exception as e:
-            print(f"Exception getting grades for assignment {assignment_id}: {e}")
-            return []
-
-    def get_classroom_assignments(self, github_username: Optional[str] = None) -> List[Dict]:
-        """
-        Get all available classrooms and their assignments, flattened for bot display.
-
-        Returns:
-            A flat list of dictionaries with keys compatible with the bot UI:
-            - name: assignment title
-            - url: invitations_url (if available)
-            - description: assignment description
-            - classroom_id, classroom_name for reference
-            - participant: True if the provided github_username is matched to this assignment
-            - matched_username: The username matched (if any)
-        """
-        flat: List[Dict] = []
-        classrooms = self.get_all_classrooms()
-        for classroom in classrooms:
-            class_id = classroom.get('id')
-            class_name = classroom.get('name')
-            assignments = self.get_assignments_for_classroom(class_id)
-            for a in assignments:
-                # Resolve per-user repository URL via grades endpoint if username provided
-                repo_url = ''
-                participant = False
-                matched_username = ''
-                if github_username:
-                    grades = self._get_assignment_grades(a.get('id'))
-                    for g in grades:
-                        # Try multiple shapes to extract username
-                        u = None
-                        if isinstance(g.get('student'), dict):
-                            u = g['student'].get('github_username') or g['student'].get('login')
-                        if not u:
-                            u = g.get('github_username') or g.get('login')
-                        if u and u.lower() == github_username.lower():
-                            repo_url = (
-                                g.get('student_repository_url')
-                                or (isinstance(g.get('repository'), dict) and (g['repository'].get('html_url') or g['repository'].get('url')))
-                                or ''
-                            )
-                            matched_username = u
-                            participant = bool(repo_url)
-                            break
-                # Fallbacks if grades did not yield a repo URL
-                if not repo_url:
-                    sr = a.get('student_repository_url')
-                    if isinstance(sr, str):
-                        repo_url = sr
-                        if github_username and github_username.lower() in sr.lower():
-                            participant = True
-                            matched_username = github_username
-                if not repo_url:
-                    repo_obj = a.get('starter_code_repository') or {}
-                    if isinstance(repo_obj, dict):
-                        repo_url = repo_obj.get('html_url') or repo_obj.get('url') or ''
-                if not repo_url:
-                    repo_url = a.get('invitations_url') or ''
-                if not participant and repo_url and github_username:
-                    if github_username.lower() in repo_url.lower():
-                        participant = True
-                        matched_username = github_username
-
-                flat.append({
-                    'name': a.get('title'),
-                    'url': repo_url,
-                    'description': a.get('description') or '',
-                    'deadline': a.get('deadline'),
-                    'assignment_id': a.get('id'),
-                    'classroom_id': class_id,
-                    'classroom_name': class_name,
-                     'participant': participant,
-                     'matched_username': matched_username,
-                })
-        return flat
-
     def get_assignment_details(self, classroom_id: int, assignment_id: int) -> Optional[Dict]:
         """
         Get detailed information about a specific assignment.
@@ -254,16 +346,16 @@ class GitHubClient:
         """
         try:
             url = f"{self.base_url}/classrooms/{classroom_id}/assignments/{assignment_id}"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url)
 
             if response.status_code == 200:
                 return response.json()
             else:
-                print(f"Error getting assignment details: {response.status_code} - {response.text}")
+                logger.warning("Error getting assignment details: %s - %s", response.status_code, response.text)
                 return None
 
-        except Exception as e:
-            print(f"Exception getting assignment details: {e}")
+        except Exception:
+            logger.exception("Exception getting assignment details")
             return None
 
     def get_accepted_assignments(self, assignment: Dict, classroom_id: Optional[int] = None) -> List[Dict]:
@@ -280,33 +372,6 @@ class GitHubClient:
         if not assignment:
             return []
 
-        def fetch_url(url: str) -> Optional[List[Dict]]:
-            items: List[Dict] = []
-            page = 1
-            while True:
-                params = {"per_page": 100, "page": page}
-                try:
-                    resp = requests.get(url, headers=self.headers, params=params)
-                except Exception as exc:
-                    print(f"Exception GET {url}: {exc}")
-                    return None
-                if resp.status_code == 404:
-                    return None
-                if resp.status_code != 200:
-                    print(f"Error GET {url}: {resp.status_code} - {resp.text}")
-                    return []
-                batch = resp.json()
-                if isinstance(batch, dict):
-                    # Endpoint returned dict, not list
-                    return []
-                if not batch:
-                    break
-                items.extend(batch)
-                if len(batch) < 100:
-                    break
-                page += 1
-            return items
-
         candidate_urls: List[str] = []
         accepted_url = assignment.get('accepted_assignments_url')
         if isinstance(accepted_url, str):
@@ -320,7 +385,7 @@ class GitHubClient:
             candidate_urls.append(f"{self.base_url}/assignments/{assignment_id}/accepted_assignments")
 
         for url in candidate_urls:
-            result = fetch_url(url)
+            result = self._get_paginated(url, missing_as_none=True)
             if result is None:
                 # Try next candidate
                 continue
@@ -357,20 +422,19 @@ class GitHubClient:
         assignments = []
 
         try:
-            user = self.github.get_user()
-            repos = user.get_repos()
+            repos = self._get_paginated(f"{self.base_url}/user/repos")
 
             for repo in repos:
                 assignments.append({
-                    'name': repo.name,
-                    'full_name': repo.full_name,
-                    'url': repo.html_url,
-                    'description': repo.description,
-                    'created_at': repo.created_at,
-                    'updated_at': repo.updated_at,
+                    'name': repo.get('name'),
+                    'full_name': repo.get('full_name'),
+                    'url': repo.get('html_url'),
+                    'description': repo.get('description'),
+                    'created_at': _parse_iso(repo.get('created_at')),
+                    'updated_at': _parse_iso(repo.get('updated_at')),
                 })
-        except Exception as e:
-            print(f"Error getting user repositories: {e}")
+        except Exception:
+            logger.exception("Error getting user repositories")
 
         return assignments
 
@@ -407,42 +471,24 @@ class GitHubClient:
 
     def get_repository_commits(self, repo_name: str, since: Optional[datetime] = None) -> List[Dict]:
         """Get commits from a repository."""
-        repo = None
+        params: Dict[str, Any] = {"per_page": 10}  # Limit to last 10 commits
+        if since:
+            params["since"] = since.isoformat()
 
         try:
-            # Try full repository path (e.g., "org/repo" or "username/repo")
-            if '/' in repo_name:
-                repo = self.github.get_repo(repo_name)
-            else:
-                # Try to get user's own repo
-                user = self.github.get_user()
-                repo = user.get_repo(repo_name)
-        except Exception as e:
-            print(f"Error getting repository {repo_name}: {e}")
-            return []
+            url = f"{self.base_url}/repos/{self._resolve_repo_name(repo_name)}/commits"
+            resp = self.session.get(url, params=params)
 
-        if not repo:
-            return []
-
-        commits = []
-        try:
-            if since:
-                commits_list = repo.get_commits(since=since)
-            else:
-                commits_list = repo.get_commits()
-
-            for commit in commits_list[:10]:  # Limit to last 10 commits
-                commits.append({
-                    'sha': commit.sha,
-                    'message': commit.commit.message,
-                    'author': commit.commit.author.name if commit.commit.author else 'Unknown',
-                    'date': commit.commit.author.date if commit.commit.author else None,
-                    'url': commit.html_url,
-                })
-        except Exception as e:
-            print(f"Error getting commits for {repo_name}: {e}")
+            if resp.status_code != 200:
+                # 409 means the repository exists but is empty
+                if resp.status_code != 409:
+                    logger.warning("Error getting commits for %s: %s - %s", repo_name, resp.status_code, resp.text)
+                return []
 
-        return commits
+            return [_format_commit(commit) for commit in resp.json() or []]
+        except Exception:
+            logger.exception("Error getting commits for %s", repo_name)
+            return []
 
     def get_latest_commit(self, repo_name: str) -> Optional[Dict]:
         """Get the latest commit from a repository."""
@@ -452,69 +498,77 @@ class GitHubClient:
     def check_repository_exists(self, repo_name: str) -> bool:
         """Check if a repository exists."""
         try:
-            # Try full repository path (e.g., "org/repo" or "username/repo")
-            if '/' in repo_name:
-                repo = self.github.get_repo(repo_name)
-            else:
-                # Try to get user's own repo
-                user = self.github.get_user()
-                repo = user.get_repo(repo_name)
-            return repo is not None
+            resp = self.session.head(f"{self.base_url}/repos/{self._resolve_repo_name(repo_name)}")
+            return resp.status_code == 200
         except Exception:
             return False
 
     def get_repository_activity(self, repo_name: str) -> Dict:
-        """Get repository activity information."""
-        repo = None
+        """
+        Get repository activity information.
 
-        try:
-            # Try full repository path (e.g., "org/repo" or "username/repo")
-            if '/' in repo_name:
-                repo = self.github.get_repo(repo_name)
-            else:
-                # Try to get user's own repo
-                user = self.github.get_user()
-                repo = user.get_repo(repo_name)
-        except Exception as e:
-            print(f"Error getting repository {repo_name}: {e}")
-            return {
-                'exists': False,
-                'has_commits': False,
-                'last_commit': None,
-                'url': None,
-            }
+        A single commits?per_page=1 request answers both questions: 404 means the
+        repository is missing, 409 (or an empty list) means it exists without commits.
+        """
+        missing = {
+            'exists': False,
+            'has_commits': False,
+            'last_commit': None,
+            'url': None,
+        }
 
-        if not repo:
+        try:
+            full_name = self._resolve_repo_name(repo_name)
+            resp = self.session.get(f"{self.base_url}/repos/{full_name}/commits", params={"per_page": 1})
+
+            if resp.status_code not in (200, 409):
+                if resp.status_code != 404:
+                    logger.warning("Error getting repository %s: %s - %s", repo_name, resp.status_code, resp.text)
+                return missing
+
+            commits = resp.json() if resp.status_code == 200 else []
+            if not commits:
+                return {
+                    'exists': True,
+                    'has_commits': False,
+                    'last_commit': None,
+                    'updated_at': None,
+                    'url': f"https://github.com/{full_name}",
+                }
+
+            latest_commit = _format_commit(commits[0])
             return {
-                'exists': False,
-                'has_commits': False,
-                'last_commit': None,
-                'url': None,
+                'exists': True,
+                'has_commits': True,
+                'last_commit': latest_commit,
+                'updated_at': latest_commit['date'],
+                # Commit URLs look like https://github.com/<owner>/<repo>/commit/<sha>
+                'url': (latest_commit['url'] or '').split('/commit/')[0] or f"https://github.com/{full_name}",
             }
+        except Exception:
+            logger.exception("Error getting repository %s", repo_name)
+            return missing
 
-        latest_commit = self.get_latest_commit(repo_name)
-
-        return {
-            'exists': True,
-            'has_commits': latest_commit is not None,
-            'last_commit': latest_commit,
-            'updated_at': repo.updated_at,
-            'url': repo.html_url,
-        }
+    def get_latest_workflow_run(self, repo_full_name: str, with_failure_summary: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the latest workflow run for a repository.
 
-    def get_latest_workflow_run(self, repo_full_name: str) -> Optional[Dict[str, Any]]:
-        """Fetch the latest workflow run for a repository."""
+        Args:
+            repo_full_name: Repository in org/repo form
+            with_failure_summary: Also fetch the jobs of a failed run to build
+                failure_summary; pass False when only the status is needed
+        """
         url = f"{self.base_url}/repos/{repo_full_name}/actions/runs"
         try:
-            resp = requests.get(url, headers=self.headers, params={"per_page": 1})
-        except Exception as e:
-            print(f"Error requesting workflow runs for {repo_full_name}: {e}")
+            resp = self.session.get(url, params={"per_page": 1, "exclude_pull_requests": "true"})
+        except Exception:
+            logger.exception("Error requesting workflow runs for %s", repo_full_name)
             return None
 
         if resp.status_code == 404:
             return None
         if resp.status_code != 200:
-            print(f"Unexpected status when fetching workflow runs for {repo_full_name}: {resp.status_code} - {resp.text}")
+            logger.warning("Unexpected status when fetching workflow runs for %s: %s - %s", repo_full_name, resp.status_code, resp.text)
             return None
 
         data = resp.json() or {}
@@ -525,7 +579,7 @@ class GitHubClient:
         run = runs[0]
         run_id = run.get("id")
         failure_summary = None
-        if run.get("conclusion") == "failure" and run_id:
+        if with_failure_summary and run.get("conclusion") == "failure" and run_id:
             failure_summary = self._get_run_failure_summary(repo_full_name, run_id)
 
         return {
@@ -544,22 +598,22 @@ class GitHubClient:
         """Collect failure details for a workflow run."""
         url = f"{self.base_url}/repos/{repo_full_name}/actions/runs/{run_id}/jobs"
         try:
-            resp = requests.get(url, headers=self.headers, params={"per_page": 100})
-        except Exception as e:
-            print(f"Error requesting workflow jobs for {repo_full_name}#{run_id}: {e}")
+            resp = self.session.get(url, params={"per_page": 100})
+        except Exception:
+            logger.exception("Error requesting workflow jobs for %s#%s", repo_full_name, run_id)
             return None
 
         if resp.status_code != 200:
-            print(f"Unexpected status when fetching jobs for {repo_full_name}#{run_id}: {resp.status_code} - {resp.text}")
+            logger.warning("Unexpected status when fetching jobs for %s#%s: %s - %s", repo_full_name, run_id, resp.status_code, resp.text)
             return None
 
         data = resp.json() or {}
-        jobs = data.get("jobs") or []
-        messages: List[str] = []
+        failed_jobs = [job for job in data.get("jobs") or [] if job.get("conclusion") == "failure"]
+        if not failed_jobs:
+            return None
 
-        for job in jobs:
-            if job.get("conclusion") != "failure":
-                continue
+        messages: List[str] = []
+        for job in failed_jobs:
             job_name = job.get("name") or "Unnamed job"
             job_url = job.get("html_url")
             prefix = f"Job '{job_name}' failed"
@@ -580,11 +634,9 @@ class GitHubClient:
                     else:
                         messages.append(f"  Step '{step_name}' failed.")
 
-        if not messages:
-            return None
         return "\n".join(messages)
 
-    def get_ci_status(self, repo_full_name: str) -> Dict[str, Any]:
+    def get_ci_status(self, repo_full_name: str, with_failure_summary: bool = True) -> Dict[str, Any]:
         """
         Return GitHub Actions CI status for repository.
 
@@ -596,7 +648,7 @@ class GitHubClient:
             - html_url (str or None)
             - failure_summary (str or None)
         """
-        run = self.get_latest_workflow_run(repo_full_name)
+        run = self.get_latest_workflow_run(repo_full_name, with_failure_summary=with_failure_summary)
         if not run:
             return {
                 "found": False,
@@ -636,13 +688,11 @@ if __name__ == "__main__":
     # Initialize client
     client = GitHubClient()
 
-    # Get all classrooms with assignments
-    classrooms_with_assignments = client.get_all_classrooms_with_assignments()
-
-    # Print results
-    for classroom in classrooms_with_assignments:
+    # Print all classrooms with their assignments
+    for classroom in client.get_all_classrooms():
+        assignments = client.get_assignments_for_classroom(classroom['id'])
         print(f"\nClassroom: {classroom['name']} (ID: {classroom['id']})")
-        print(f"Assignments: {classroom['assignments_count']}")
+        print(f"Assignments: {len(assignments)}")
 
-        for assignment in classroom['assignments']:
+        for assignment in assignments:
             print(f"  - {assignment['title']} (Deadline: {assignment['deadline']})")
\ No newline at end of file
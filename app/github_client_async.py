@@ -0,0 +1,182 @@
+"""Async GitHub Classroom API integration (httpx, HTTP/2)."""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, Tuple
+import httpx
+from app.config import Config
+from app.github_client import (
+    cache_listing,
+    flatten_classroom_assignment,
+    get_cached_listing,
+    normalize_assignment,
+    normalize_classroom,
+)
+
+logger = logging.getLogger(__name__)
+
+class AsyncGitHubClient:
+    """Async counterpart of GitHubClient for the Classroom REST fan-out.
+
+    All requests share one HTTP/2 connection, so classrooms x assignments x
+    grades lookups run concurrently instead of one round-trip at a time.
+    """
+
+    # Last ETag, body and next-page URL per (token, page URL). A 304 answer to
+    # If-None-Match has no body and does not count against the rate limit.
+    # Kept in LRU order and capped at ETAG_CACHE_MAXSIZE pages.
+    ETAG_CACHE_MAXSIZE = 512
+    # Grade lookups fan out one request per assignment over a single HTTP/2
+    # connection; GitHub's secondary rate limit rejects large bursts of
+    # concurrent requests, so at most this many are in flight per client.
+    MAX_CONCURRENT_REQUESTS = 10
+
+    _etag_cache: 'OrderedDict[Tuple[str, str], Tuple[str, List[Any], Optional[str]]]' = OrderedDict()
+
+    def __init__(self, token: str = None):
+        """
+        Initialize async GitHub client.
+
+        Args:
+            token: GitHub personal access token. If None, uses Config.GITHUB_TOKEN
+        """
+        self.token = token or Config.GITHUB_TOKEN
+
+        if not self.token:
+            raise ValueError("GitHub token is required")
+
+        self.base_url = "https://api.github.com"
+        self.headers = {
+            "Authorization": f"token {self.token}",
+            "Accept": "application/vnd.github.v3+json",
+            "User-Agent": "Classroom-Guardian-Bot"
+        }
+        self._client = httpx.AsyncClient(
+            http2=True,
+            headers=self.headers,
+            timeout=30,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+        )
+        self._request_slots = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+
+    async def __aenter__(self) -> 'AsyncGitHubClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+    async def _get_paginated(self, url: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Generic helper to fetch all pages for a GitHub REST endpoint."""
+        items: List[Any] = []
+        next_url: Optional[str] = url
+        next_params: Optional[Dict[str, Any]] = {"per_page": 100, **(params or {})}
+        while next_url:
+            try:
+                request = self._client.build_request("GET", next_url, params=next_params)
+                key = (self.token, str(request.url))
+                cached = self._etag_cache.get(key)
+                if cached:
+                    self._etag_cache.move_to_end(key)
+                    request.headers["If-None-Match"] = cached[0]
+                async with self._request_slots:
+                    resp = await self._client.send(request)
+                if resp.status_code == 304 and cached:
+                    batch, following = cached[1], cached[2]
+                else:
+                    if resp.status_code != 200:
+                        logger.warning("Error GET %s: %s - %s", next_url, resp.status_code, resp.text)
+                        break
+                    batch = resp.json()
+                    if not isinstance(batch, list):
+                        break
+                    following = resp.links.get('next', {}).get('url')
+                    etag = resp.headers.get('ETag')
+                    if etag:
+                        self._etag_cache[key] = (etag, batch, following)
+                        self._etag_cache.move_to_end(key)
+                        while len(self._etag_cache) > self.ETAG_CACHE_MAXSIZE:
+                            self._etag_cache.popitem(last=False)
+                items.extend(batch)
+                next_url = following
+                next_params = None
+            except Exception:
+                logger.exception("GET %s failed", next_url)
+                break
+        return items
+
+    async def get_all_classrooms(self) -> List[Dict]:
+        """Get all classrooms accessible to the authenticated user."""
+        key = ('classrooms', self.token)
+        cached = get_cached_listing(key)
+        if cached is not None:
+            return cached
+        try:
+            classrooms_data = await self._get_paginated(f"{self.base_url}/classrooms")
+            classrooms = [normalize_classroom(classroom) for classroom in classrooms_data]
+        except Exception:
+            logger.exception("Exception getting classrooms")
+            return []
+        cache_listing(key, classrooms)
+        return classrooms
+
+    async def get_assignments_for_classroom(self, classroom_id: int) -> List[Dict]:
+        """Get all assignments for a specific classroom."""
+        key = ('assignments', self.token, classroom_id)
+        cached = get_cached_listing(key)
+        if cached is not None:
+            return cached
+        try:
+            url = f"{self.base_url}/classrooms/{classroom_id}/assignments"
+            assignments_data = await self._get_paginated(url)
+            assignments = [normalize_assignment(assignment) for assignment in assignments_data]
+        except Exception:
+            logger.exception("Exception getting assignments for classroom %s", classroom_id)
+            return []
+        cache_listing(key, assignments)
+        return assignments
+
+    async def _get_assignment_grades(self, assignment_id: int) -> List[Dict]:
+        """Fetch grades (or per-student records) for a specific assignment."""
+        try:
+            return await self._get_paginated(f"{self.base_url}/assignments/{assignment_id}/grades")
+        except Exception:
+            logger.exception("Exception getting grades for assignment %s", assignment_id)
+            return []
+
+    async def get_all_classrooms_with_assignments(self) -> List[Dict]:
+        """Get all classrooms with their assignments, fetched concurrently."""
+        classrooms = await self.get_all_classrooms()
+        assignment_lists = await asyncio.gather(
+            *(self.get_assignments_for_classroom(c['id']) for c in classrooms)
+        )
+        for classroom, assignments in zip(classrooms, assignment_lists):
+            classroom['assignments'] = assignments
+            classroom['assignments_count'] = len(assignments)
+        return classrooms
+
+    async def get_classroom_assignments(self, github_username: Optional[str] = None) -> List[Dict]:
+        """
+        Get all available classrooms and their assignments, flattened for bot display.
+
+        Returns:
+            A flat list of dictionaries with keys compatible with the bot UI
+            (see flatten_classroom_assignment)
+        """
+        classrooms = await self.get_all_classrooms_with_assignments()
+        pairs = [(c, a) for c in classrooms for a in c['assignments']]
+
+        async def no_grades() -> List[Dict]:
+            return []
+
+        grade_lists = await asyncio.gather(*(
+            self._get_assignment_grades(a.get('id')) if github_username else no_grades()
+            for _, a in pairs
+        ))
+        return [
+            flatten_classroom_assignment(classroom, a, grades, github_username)
+            for (classroom, a), grades in zip(pairs, grade_lists)
+        ]
@@ -1,109 +1,323 @@
 """Notification system for deadlines."""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
-from app.database import Assignment, Submission, User, Notification, AppSettings, get_or_create_settings
+from sqlalchemy.orm import Session, raiseload, selectinload
+from sqlalchemy import func, insert, select, union
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.database import Assignment, Submission, User, Notification, get_cached_settings
 from app.github_client import GitHubClient
 from telegram import Bot
 from app.config import Config
 
+logger = logging.getLogger(__name__)
+
+# All database work of a cycle runs on this one thread: the cycle's session
+# never hops threads, and queries and the commit stay off the event loop
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notifications-db")
+
+# Most reminders sent per cycle, so one transaction never spans an unbounded
+# burst; the scheduler re-runs right away when a cycle hits the cap
+SEND_BATCH_CAP = 500
+
+# Concurrent Telegram sends per cycle; pacing to ~30 msg/s is left to the
+# application's AIORateLimiter
+SEND_CONCURRENCY = 30
+
+DEADLINE_TEMPLATE = (
+    "⏰ Deadline Reminder\n\n"
+    "Assignment: {name}\n"
+    "Deadline: {deadline}\n"
+    "Time remaining: {remaining}\n"
+    "Repository: {repo}"
+)
+
+def _format_time_remaining(delta: timedelta) -> str:
+    """Render a time-until-deadline as '2d 5h' or '5h'."""
+    hours_until_deadline = delta.total_seconds() / 3600
+    days = int(hours_until_deadline // 24)
+    hours = int(hours_until_deadline % 24)
+    return f"{days}d {hours}h" if days > 0 else f"{hours}h"
+
+def assignment_recipients(*criteria):
+    """(assignment_id, user_id) pairs: the assignment owner plus every submitter.
+
+    criteria filter the assignments (e.g. a deadline window) inside both
+    branches, so only those assignments and their submissions are read.
+    """
+    return union(
+        select(Assignment.id.label('assignment_id'), Assignment.user_id.label('user_id'))
+        .where(Assignment.user_id.isnot(None), *criteria),
+        select(Submission.assignment_id, Submission.user_id)
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .where(*criteria),
+    ).subquery()
+
+def last_deadline_warning():
+    """Latest deadline_warning sent_at for the enclosing query's (User, Assignment).
+
+    Correlated, so each pair is one probe of ix_notif_lookup rather than a
+    GROUP BY over the whole notifications table.
+    """
+    return (
+        select(func.max(Notification.sent_at))
+        .where(
+            Notification.user_id == User.id,
+            Notification.assignment_id == Assignment.id,
+            Notification.notification_type == 'deadline_warning',
+        )
+        .correlate(User, Assignment)
+        .scalar_subquery()
+    )
+
+class PendingReminder(NamedTuple):
+    """Reminder timing for one (user, assignment) pair with an upcoming deadline."""
+    assignment_id: int
+    owner_id: Optional[int]
+    user_id: int
+    deadline: datetime
+    # deadline - threshold: when the first reminder falls due
+    first_at: datetime
+    # When the next reminder falls due, given the last one sent
+    next_at: datetime
+
+def earliest_reminder(reminders: List[PendingReminder]) -> Optional[datetime]:
+    """Earliest next_at among reminders still due before their deadline."""
+    return min((r.next_at for r in reminders if r.next_at < r.deadline), default=None)
+
 class NotificationService:
     """Service for handling notifications."""
     
-    def __init__(self, bot: Bot, db: Session):
+    def __init__(self, bot: Bot, db: Optional[Session] = None):
         self.bot = bot
         self.db = db
+
+    def set_session(self, db: Optional[Session]):
+        """Point a long-lived service at the session for the current run."""
+        self.db = db
     
-    async def check_upcoming_deadlines(self):
-        """Check for upcoming deadlines and notify users about their assignments (per-user settings)."""
+    async def check_upcoming_deadlines(self) -> int:
+        """Check for upcoming deadlines and notify users about their assignments (per-user settings).
+
+        Returns the number of reminders delivered (at most SEND_BATCH_CAP).
+        Reads happen in one short transaction ended by collect_due; the sent
+        notifications are written in a single transaction committed by
+        _save_notifications. Database work runs via run_db; only Telegram I/O
+        stays on the event loop.
+        """
+        outbox = await self.run_db(self.collect_due)
+        sent_notes = await self._deliver(outbox)
+        await self.run_db(self._save_notifications, sent_notes)
+        return len(sent_notes)
+
+    async def run_db(self, fn, *args):
+        """Run blocking database work on the notifications database thread."""
+        return await asyncio.get_running_loop().run_in_executor(_db_executor, fn, *args)
+
+    def pending_reminders(self) -> List[PendingReminder]:
+        """Reminder timing for every (user, assignment) pair with an upcoming deadline.
+
+        next_at is deadline - threshold for pairs not yet warned, and the later
+        of that and last_sent + period otherwise.
+        """
+        app_settings = get_cached_settings(self.db)
+        now = datetime.utcnow()
+        pairs = assignment_recipients(Assignment.deadline > now)
+        rows = self.db.execute(
+            select(
+                Assignment.id,
+                Assignment.user_id,
+                User.id,
+                Assignment.deadline,
+                User.notify_threshold_hours,
+                User.notify_period_seconds,
+                last_deadline_warning(),
+            )
+            .select_from(pairs)
+            .join(Assignment, Assignment.id == pairs.c.assignment_id)
+            .join(User, User.id == pairs.c.user_id)
+        ).all()
+
+        reminders: List[PendingReminder] = []
+        for assignment_id, owner_id, user_id, deadline, threshold_hours, period_seconds, last_sent_at in rows:
+            if threshold_hours is None:
+                threshold_hours = app_settings.notify_threshold_hours
+            if period_seconds is None:
+                period_seconds = app_settings.notify_period_seconds
+            first_at = deadline - timedelta(hours=threshold_hours)
+            next_at = first_at
+            if last_sent_at:
+                next_at = max(first_at, last_sent_at + timedelta(seconds=period_seconds))
+            reminders.append(PendingReminder(assignment_id, owner_id, user_id, deadline, first_at, next_at))
+        return reminders
+
+    def next_notification_at(self) -> Optional[datetime]:
+        """Earliest moment any pending (user, assignment) pair is due a reminder.
+
+        None when no deadline is upcoming.
+        """
+        return earliest_reminder(self.pending_reminders())
+
+    def collect_due(self) -> Dict[int, List[Tuple[str, Dict]]]:
+        """Build the reminders due now, grouped per chat as (text, notification row).
+
+        Ends the read transaction before returning, so no pooled connection
+        sits idle in transaction while the messages are delivered. It commits
+        rather than rolls back to keep a settings row created on first use.
+        """
+        outbox = self._build_outbox()
+        self.db.commit()
+        return outbox
+
+    def _build_outbox(self) -> Dict[int, List[Tuple[str, Dict]]]:
+        """Query the due (user, assignment) pairs and render their messages."""
         # App-wide defaults
-        app_settings = get_or_create_settings(self.db)
+        app_settings = get_cached_settings(self.db)
 
         now = datetime.utcnow()
 
-        # For each user with assignments, compute threshold and period and send if due
-        users = self.db.query(User).all()
-        for user in users:
+        # Nothing can be due past the longest threshold anyone has, so probe
+        # that horizon on the deadline index before the heavier queries
+        # (merely "any future deadline" is almost never empty)
+        horizon_hours = max(
+            self.db.execute(select(func.max(User.notify_threshold_hours))).scalar() or 0,
+            app_settings.notify_threshold_hours or 0,
+        )
+        if self.db.execute(
+            select(Assignment.id)
+            .where(Assignment.deadline > now, Assignment.deadline <= now + timedelta(hours=horizon_hours))
+            .limit(1)
+        ).first() is None:
+            return {}
+
+        # Coarse window: the largest threshold among users that have any pending
+        # deadline (EXISTS), so idle users with long thresholds don't widen it.
+        # Per-user thresholds are applied to the (much smaller) result set below.
+        upcoming = assignment_recipients(Assignment.deadline > now)
+        max_user_threshold = self.db.execute(
+            select(func.max(User.notify_threshold_hours))
+            .join(upcoming, upcoming.c.user_id == User.id)
+        ).scalar() or 0
+        max_threshold = max(max_user_threshold, app_settings.notify_threshold_hours or 0)
+
+        pairs = assignment_recipients(
+            Assignment.deadline > now,
+            Assignment.deadline <= now + timedelta(hours=max_threshold),
+        )
+        rows = self.db.execute(
+            select(Assignment, User, last_deadline_warning())
+            .select_from(pairs)
+            .join(Assignment, Assignment.id == pairs.c.assignment_id)
+            .join(User, User.id == pairs.c.user_id)
+            # Most urgent first, so a capped cycle sends those
+            .order_by(Assignment.deadline, Assignment.id)
+            # Anything beyond the explicit load must fail loudly, not lazy-load per row
+            .options(selectinload(Assignment.submissions).raiseload('*'), raiseload('*'))
+        ).all()
+
+        # Deadline text depends only on the assignment, not the recipient
+        deadline_strs: Dict[int, Tuple[str, str]] = {}
+        for assignment, _, _ in rows:
+            if assignment.id not in deadline_strs:
+                deadline_strs[assignment.id] = (
+                    assignment.deadline.strftime('%Y-%m-%d %H:%M:%S UTC'),
+                    _format_time_remaining(assignment.deadline - now),
+                )
+
+        # Messages to deliver, grouped per chat: (text, notification row)
+        outbox: Dict[int, List[Tuple[str, Dict]]] = {}
+        queued = 0
+        for assignment, user, last_sent_at in rows:
+            if queued >= SEND_BATCH_CAP:
+                break
             threshold_hours = user.notify_threshold_hours if user.notify_threshold_hours is not None else app_settings.notify_threshold_hours
             period_seconds = user.notify_period_seconds if user.notify_period_seconds is not None else app_settings.notify_period_seconds
 
-            warning_time = now + timedelta(hours=threshold_hours)
-
-            # Only consider this user's assignments
-            upcoming = (
-                self.db.query(Assignment)
-                .options(joinedload(Assignment.submissions))
-                .outerjoin(Submission, Submission.assignment_id == Assignment.id)
-                .filter(
-                    and_(
-                        Assignment.deadline <= warning_time,
-                        Assignment.deadline > now,
-                        or_(
-                            Assignment.user_id == user.id,
-                            Submission.user_id == user.id
-                        )
-                    )
-                )
-                .distinct()
-                .all()
-            )
+            if assignment.deadline > now + timedelta(hours=threshold_hours):
+                continue
 
-            for assignment in upcoming:
-                # Check last notification time for this user/assignment
-                last = self.db.query(Notification).filter(
-                    and_(
-                        Notification.user_id == user.id,
-                        Notification.assignment_id == assignment.id,
-                        Notification.notification_type == 'deadline_warning'
-                    )
-                ).order_by(Notification.sent_at.desc()).first()
-
-                should_send = False
-                if not last:
+            should_send = False
+            if not last_sent_at:
+                should_send = True
+            else:
+                elapsed = (now - last_sent_at).total_seconds()
+                if elapsed >= period_seconds:
                     should_send = True
-                else:
-                    elapsed = (now - last.sent_at).total_seconds()
-                    if elapsed >= period_seconds:
-                        should_send = True
-
-                if not should_send:
-                    continue
-
-                hours_until_deadline = (assignment.deadline - now).total_seconds() / 3600
-                days = int(hours_until_deadline // 24)
-                hours = int(hours_until_deadline % 24)
-                time_remaining = f"{days}d {hours}h" if days > 0 else f"{hours}h"
-
-                submission = next(
-                    (s for s in assignment.submissions or [] if s.user_id == user.id),
-                    None
-                )
-                repo_ref = ''
-                if submission and submission.github_repo_url:
-                    repo_ref = submission.github_repo_url
-                else:
-                    repo_ref = assignment.github_repo_url or assignment.github_repo_name or ''
-
-                message = (
-                    f"⏰ Deadline Reminder\n\n"
-                    f"Assignment: {assignment.name}\n"
-                    f"Deadline: {assignment.deadline.strftime('%Y-%m-%d %H:%M:%S UTC')}\n"
-                    f"Time remaining: {time_remaining}\n"
-                    f"Repository: {repo_ref}"
-                )
 
+            if not should_send:
+                continue
+
+            submission = next(
+                (s for s in assignment.submissions or [] if s.user_id == user.id),
+                None
+            )
+            repo_ref = ''
+            if submission and submission.github_repo_url:
+                repo_ref = submission.github_repo_url
+            else:
+                repo_ref = assignment.github_repo_url or assignment.github_repo_name or ''
+
+            deadline_str, time_remaining = deadline_strs[assignment.id]
+            message = DEADLINE_TEMPLATE.format_map({
+                'name': assignment.name,
+                'deadline': deadline_str,
+                'remaining': time_remaining,
+                'repo': repo_ref,
+            })
+
+            outbox.setdefault(user.telegram_id, []).append((message, {
+                'user_id': user.id,
+                'assignment_id': assignment.id,
+                'notification_type': 'deadline_warning',
+                'message': message,
+                'sent_at': now,
+            }))
+            queued += 1
+
+        return outbox
+
+    async def _deliver(self, outbox: Dict[int, List[Tuple[str, Dict]]]) -> List[Dict]:
+        """Send queued messages concurrently and return the rows of those delivered.
+
+        Chats are processed in parallel, bounded by SEND_CONCURRENCY; the
+        application's rate limiter paces the actual Bot API calls. Messages to
+        one chat go out in order.
+        """
+        semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+
+        async def send_chat(chat_id: int, messages: List[Tuple[str, Dict]]) -> List[Dict]:
+            delivered: List[Dict] = []
+            for text, note in messages:
                 try:
-                    await self.bot.send_message(
-                        chat_id=user.telegram_id,
-                        text=message
-                    )
-                    note = Notification(
-                        user_id=user.id,
-                        assignment_id=assignment.id,
-                        notification_type='deadline_warning',
-                        message=message
-                    )
-                    self.db.add(note)
-                    self.db.commit()
+                    async with semaphore:
+                        await self.bot.send_message(chat_id=chat_id, text=text)
+                    delivered.append(note)
                 except Exception as e:
-                    print(f"Error sending notification to {user.telegram_id}: {e}")
+                    logger.warning("Error sending notification to %s: %s", chat_id, e)
+            return delivered
+
+        # send_chat handles send errors itself; anything escaping it cancels the rest
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(send_chat(chat_id, messages)) for chat_id, messages in outbox.items()]
+        return [note for task in tasks for note in task.result()]
+
+    def _save_notifications(self, notes: List[Dict]):
+        """Insert sent notifications as one batch and commit them.
+
+        Falls back to per-row inserts if the batch is rejected.
+        """
+        if notes:
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(Notification), notes)
+            except IntegrityError:
+                # Keep the rest of the cycle's records if one row is rejected
+                for note in notes:
+                    try:
+                        with self.db.begin_nested():
+                            self.db.execute(insert(Notification), [note])
+                    except IntegrityError as e:
+                        logger.warning("Error saving notification for user %s: %s", note['user_id'], e)
+        self.db.commit()
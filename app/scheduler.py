@@ -1,76 +1,247 @@
 """Scheduler utilities for periodic notification checks."""
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple, Union
+from sqlalchemy import func, select
 from telegram.ext import Application, ContextTypes
 from telegram import Bot
-from app.database import get_db, get_or_create_settings, User
-from app.notifications import NotificationService
+from app.database import SessionLocal, get_cached_settings, User
+from app.notifications import SEND_BATCH_CAP, NotificationService, earliest_reminder
 from app.config import Config
 import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+CHAIN_JOB_NAME = "deadline_notifications"
+# One-off checks when first reminders fall due, named by their run time
+WAKEUP_JOB_PREFIX = "deadline_wakeup_"
+DUE_NOW_JOB_NAME = "deadline_due_now"
+
+# Pause before re-running a cycle that hit SEND_BATCH_CAP
+FETCH_COOLDOWN = 0.1
+
+# Longest gap between checks, so assignments synced without a wake-up
+# (e.g. from GitHub Classroom) are still picked up
+SWEEP_INTERVAL = 3600
+
+# The poll interval depends only on settings, so reuse it for a while
+INTERVAL_CACHE_TTL = 60
+_interval_cache: Optional[Tuple[float, int]] = None
 
 class NotificationScheduler:
     """Scheduler helper that uses Telegram Application's job queue."""
 
     def __init__(self, application: Application):
         self.application = application
-        self.job = None
+        self.session_factory = SessionLocal
+        # One service for every run; each run hands it a fresh session
+        self._notification_service = NotificationService(None)
+        # At most one check in flight; ticks arriving meanwhile collapse into one rerun
+        self._running = asyncio.Lock()
+        self._pending = False
+
+    @staticmethod
+    def invalidate_interval_cache():
+        """Drop the cached poll interval; call after changing notify periods."""
+        global _interval_cache
+        _interval_cache = None
 
     def _compute_interval_seconds(self) -> int:
-        """Derive poll interval based on global + per-user settings."""
-        db_gen = get_db()
-        db = next(db_gen)
+        """Derive poll interval based on global + per-user settings (blocking)."""
+        global _interval_cache
+        if _interval_cache and time.monotonic() - _interval_cache[0] < INTERVAL_CACHE_TTL:
+            return _interval_cache[1]
+
         try:
-            settings = get_or_create_settings(db)
-            base_period = settings.notify_period_seconds or Config.NOTIFICATION_CHECK_INTERVAL
-            user_periods = [
-                u.notify_period_seconds for u in db.query(User).all()
-                if u.notify_period_seconds and u.notify_period_seconds > 0
-            ]
-            effective_period = min(user_periods) if user_periods else base_period
+            with self.session_factory() as db:
+                settings = get_cached_settings(db)
+                base_period = settings.notify_period_seconds or Config.NOTIFICATION_CHECK_INTERVAL
+                min_user_period = db.execute(
+                    select(func.min(User.notify_period_seconds))
+                    .where(User.notify_period_seconds > 0)
+                ).scalar()
+            effective_period = min_user_period or base_period
+            cacheable = True
         except Exception:
             effective_period = Config.NOTIFICATION_CHECK_INTERVAL
-        finally:
-            db.close()
+            cacheable = False
 
         if not effective_period or effective_period <= 0:
             effective_period = Config.NOTIFICATION_CHECK_INTERVAL
         half_period = int(effective_period / 2)
         if half_period <= 0:
             half_period = int(effective_period)
-        return max(15, half_period)
+        interval = max(15, half_period)
+        if cacheable:
+            _interval_cache = (time.monotonic(), interval)
+        return interval
 
     async def _job_callback(self, context: ContextTypes.DEFAULT_TYPE):
         """Background job entry point."""
-        await self.check_deadlines(context.bot)
+        if self._running.locked():
+            self._pending = True
+            return
+        async with self._running:
+            sent = await self.check_deadlines(context.bot)
+            while self._pending:
+                self._pending = False
+                sent = await self.check_deadlines(context.bot)
+        if sent >= SEND_BATCH_CAP:
+            # A full, fully delivered batch: more are likely due right now.
+            # Failed sends keep the count below the cap, so they can't spin this.
+            self._arm_once(CHAIN_JOB_NAME, FETCH_COOLDOWN)
+            return
+        delay = await asyncio.to_thread(self._next_delay_seconds)
+        self._arm_once(CHAIN_JOB_NAME, delay)
+
+    def _next_delay_seconds(self) -> int:
+        """Seconds until the next reminder falls due, bounded to [15, SWEEP_INTERVAL].
+
+        Blocking: runs database queries, so async callers go through
+        asyncio.to_thread.
+        """
+        try:
+            with self.session_factory() as db:
+                next_at = NotificationService(None, db).next_notification_at()
+        except Exception:
+            logger.exception("Error computing next deadline check")
+            return self._compute_interval_seconds()
+        return self._delay_until(next_at)
+
+    def _delay_until(self, next_at: Optional[datetime]) -> int:
+        """Delay for a chained check at next_at, bounded to [15, SWEEP_INTERVAL].
+
+        Overdue reminders (e.g. a send that failed) are retried at the old
+        period-derived interval instead of in a tight loop.
+        """
+        if next_at is None:
+            return SWEEP_INTERVAL
+        delay = (next_at - datetime.utcnow()).total_seconds()
+        if delay <= 0:
+            return self._compute_interval_seconds()
+        return int(min(SWEEP_INTERVAL, max(15, delay)))
+
+    def _arm_once(self, name: str, when):
+        """Schedule a one-off check under name, replacing an earlier one."""
+        job_queue = self.application.job_queue
+        for job in job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
+        job_queue.run_once(self._job_callback, when=when, name=name)
+
+    def _plan(self, changed_user_id: Optional[int] = None) -> Tuple[Optional[Tuple[Set[datetime], bool]], int]:
+        """Wake-up times and the next chained delay, from one pass over pending reminders.
+
+        A check runs at deadline - threshold for every (user, assignment) pair,
+        so the first reminder goes out on time rather than on the next chained
+        check. Each check covers every due pair, so pairs sharing a time share a
+        job. The flag asks for an immediate check, and is only set when a pair
+        of changed_user_id (as recipient or assignment owner) is due a reminder
+        right now; other users' due pairs are left to the chain. Wake-ups are
+        None on error. Blocking: runs database queries.
+        """
+        try:
+            with self.session_factory() as db:
+                reminders = NotificationService(None, db).pending_reminders()
+        except Exception:
+            logger.exception("Error scheduling deadline wake-ups")
+            return None, self._compute_interval_seconds()
+
+        now = datetime.utcnow()
+        run_times: Set[datetime] = set()
+        due_now = False
+        for reminder in reminders:
+            if reminder.first_at > now:
+                run_times.add(reminder.first_at.replace(microsecond=0))
+            if (
+                changed_user_id is not None
+                and changed_user_id in (reminder.user_id, reminder.owner_id)
+                and reminder.next_at <= now < reminder.deadline
+            ):
+                due_now = True
+        return (run_times, due_now), self._delay_until(earliest_reminder(reminders))
+
+    def _arm_wakeups(self, wakeups: Optional[Tuple[Set[datetime], bool]]) -> int:
+        """Reconcile wake-up jobs with wakeups in one pass over the job queue.
+
+        Returns the number of wake-ups now scheduled.
+        """
+        if wakeups is None:
+            return 0
+        run_times, due_now = wakeups
+        # Deadlines are stored as naive UTC; the job queue treats naive datetimes as UTC
+        wanted: Dict[str, Union[datetime, int]] = {
+            f"{WAKEUP_JOB_PREFIX}{run_at:%Y%m%dT%H%M%S}": run_at for run_at in run_times
+        }
+        if due_now:
+            wanted[DUE_NOW_JOB_NAME] = 1
+
+        job_queue = self.application.job_queue
+        existing = {
+            job.name: job for job in job_queue.jobs()
+            if job.name == DUE_NOW_JOB_NAME or (job.name or '').startswith(WAKEUP_JOB_PREFIX)
+        }
+        for name, job in existing.items():
+            if name not in wanted:
+                job.schedule_removal()
+        for name, when in wanted.items():
+            if name not in existing:
+                job_queue.run_once(self._job_callback, when=when, name=name)
+        return len(wanted)
+
+    async def notify_deadlines_changed(self, user_id: Optional[int] = None):
+        """Re-arm wake-ups and the next check after deadlines change.
+
+        Call after committing an assignment insert, deadline update, deletion,
+        new submission or notify setting change by user_id, so the change is
+        picked up now rather than on the next sweep. Handlers should run it as
+        a background task rather than await it before replying.
+        """
+        # Queries run in a worker thread so command handling is not blocked
+        wakeups, delay = await asyncio.to_thread(self._plan, user_id)
+        self._arm_wakeups(wakeups)
+        self._arm_once(CHAIN_JOB_NAME, delay)
 
     def start(self):
-        """Register repeating job in Telegram job queue."""
-        interval = self._compute_interval_seconds()
-        if self.job:
-            self.job.schedule_removal()
-        self.job = self.application.job_queue.run_repeating(
-            self._job_callback,
-            interval=interval,
-            first=interval,
-            name="deadline_notifications",
-        )
-        print(f"Notification scheduler started (interval={interval}s)")
+        """Arm the first deadline check in Telegram job queue."""
+        wakeups, delay = self._plan()
+        # Replicas restarted together would otherwise all query the database at
+        # the same moment, so the first check fires at a random point between
+        # half and all of its delay; firing early only costs one check that
+        # finds nothing. It also covers reminders already due, so no immediate
+        # wake-up is armed here.
+        first = int(random.uniform(delay * 0.5, delay))
+        self._arm_once(CHAIN_JOB_NAME, first)
+        scheduled = self._arm_wakeups(wakeups)
+        logger.info("Notification scheduler started (next check in %ss, %s deadline wake-ups)", first, scheduled)
 
     def stop(self):
-        """Remove scheduled job if present."""
-        if self.job:
-            self.job.schedule_removal()
-            self.job = None
-            print("Notification scheduler stopped")
-
-    async def check_deadlines(self, bot: Bot):
-        """Check for upcoming deadlines."""
+        """Remove scheduled jobs if present."""
+        removed = 0
+        for job in self.application.job_queue.jobs():
+            if job.callback == self._job_callback:
+                job.schedule_removal()
+                removed += 1
+        if removed:
+            logger.info("Notification scheduler stopped")
+
+    async def check_deadlines(self, bot: Bot) -> int:
+        """Check for upcoming deadlines; returns the number of reminders delivered."""
+        notification_service = self._notification_service
         try:
-            db_gen = get_db()
-            db = next(db_gen)
+            # One session per job run; the service commits it as a single
+            # transaction. It connects lazily, on the service's database thread.
+            db = self.session_factory()
+            notification_service.bot = bot
+            notification_service.set_session(db)
             try:
-                notification_service = NotificationService(bot, db)
-                await notification_service.check_upcoming_deadlines()
+                return await notification_service.check_upcoming_deadlines()
             finally:
-                db.close()
-        except Exception as e:
-            print(f"Error checking deadlines: {e}")
+                notification_service.set_session(None)
+                # Closing returns the connection to the pool (a reset round-trip)
+                await notification_service.run_db(db.close)
+        except Exception:
+            logger.exception("Error checking deadlines")
+            return 0
 
@@ -1,5 +1,4 @@
 """Database setup script."""
-from app.database import init_db
 from app.config import Config
 
 def main():
@@ -11,6 +10,9 @@ def main():
         print("Please check your .env file and ensure all required variables are set.")
         return
     
+    # Imported only once the config is valid: it creates the engine and mappers
+    from app.database import init_db
+
     print("Initializing database...")
     init_db()
     print("Database initialized successfully!")